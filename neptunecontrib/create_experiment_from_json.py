@@ -116,22 +116,23 @@ def main(arguments):
                                    params=json_exp['params'],
                                    properties=json_exp['properties'],
                                    tags=json_exp['tags'],
-                                   upload_source_files=json_exp['upload_source_files']):
+                                   upload_source_files=json_exp['upload_source_files']) as exp:
 
         for name, channel_xy in json_exp['log_metric'].items():
             for x, y in zip(channel_xy['x'], channel_xy['y']):
-                neptune.log_metric(name, x=x, y=y)
+                exp.log_metric(name, x=x, y=y)
 
         for name, channel_xy in json_exp['log_text'].items():
             for x, y in zip(channel_xy['x'], channel_xy['y']):
-                neptune.log_text(name, x=x, y=y)
+                exp.log_text(name, x=x, y=y)
 
         for name, channel_xy in json_exp['log_image'].items():
             for x, y in zip(channel_xy['x'], channel_xy['y']):
-                neptune.log_image(name, x=x, y=y)
+                exp.log_image(name, x=x, y=y)
 
         for filename in json_exp['log_artifact']:
-            neptune.log_artifact(filename)
+            exp.log_artifact(filename)
+
 
 def parse_args():
     parser = argparse.ArgumentParser()
@@ -13,11 +13,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-import os
-import tempfile
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 
 import neptune
 import xgboost as xgb
+from PIL import Image
 
 
 def neptune_callback(log_model=True,
@@ -73,11 +75,11 @@ def neptune_callback(log_model=True,
               object if you want to control to which experiment data is logged.
             | If ``None``, log to currently active, and most recent experiment.
         kwargs:
-            Parametrize XGBoost functions used in this callback:
+            Parametrize feature importance chart, which takes the same arguments as
             `xgboost.plot_importance <https://xgboost.readthedocs.io/en/latest/python/python_api.html
-            ?highlight=plot_tree#xgboost.plot_importance>`_
-            and `xgboost.to_graphviz <https://xgboost.readthedocs.io/en/latest/python/python_api.html
-            ?highlight=plot_tree#xgboost.to_graphviz>`_.
+            ?highlight=plot_tree#xgboost.plot_importance>`_ and passes the remaining ones to ``matplotlib``'s
+            ``barh``, and `xgboost.to_graphviz <https://xgboost.readthedocs.io/en/latest/python/python_api.html
+            ?highlight=plot_tree#xgboost.to_graphviz>`_ used to render trees.
 
     Returns:
         :obj:`callback`, function that you can pass directly to the XGBoost callbacks list, for example to the
@@ -183,55 +185,129 @@ def neptune_callback(log_model=True,
                 _exp.log_metric('{}-mean'.format(item[0]), item[1])
                 _exp.log_metric('{}-std'.format(item[0]), item[2])
 
+        if env.iteration + 1 != env.end_iteration:
+            return
+
         # Log booster, end of training
-        if env.iteration + 1 == env.end_iteration and log_model:
-            if env.cvfolds:  # cv case
-                for i, cvpack in enumerate(env.cvfolds):
-                    _log_model(cvpack.bst, 'cv-fold-{}-bst.model'.format(i), _exp)
-            else:  # train case
-                _log_model(env.model, 'bst.model', _exp)
+        if log_model:
+            try:
+                if env.cvfolds:  # cv case
+                    with ThreadPoolExecutor(max_workers=min(8, len(env.cvfolds))) as executor:
+                        futures = [executor.submit(_log_model, cvpack.bst, 'cv-fold-{}-bst.model'.format(i), _exp)
+                                   for i, cvpack in enumerate(env.cvfolds)]
+                    for future in futures:
+                        future.result()
+                else:  # train case
+                    _log_model(env.model, 'bst.model', _exp)
+            except Exception as e:
+                print('Did not log booster. Error: {}'.format(e))
 
         # Log feature importance, end of training
-        if env.iteration + 1 == env.end_iteration and log_importance:
-            if env.cvfolds:  # cv case
-                for i, cvpack in enumerate(env.cvfolds):
-                    _log_importance(cvpack.bst, max_num_features, _exp, title='cv-fold-{}'.format(i), **kwargs)
-            else:  # train case
-                _log_importance(env.model, max_num_features, _exp, **kwargs)
+        if log_importance:
+            try:
+                if env.cvfolds:  # cv case
+                    for i, cvpack in enumerate(env.cvfolds):
+                        _log_importance(cvpack.bst, max_num_features, _exp, title='cv-fold-{}'.format(i), **kwargs)
+                else:  # train case
+                    _log_importance(env.model, max_num_features, _exp, **kwargs)
+            except Exception as e:
+                print('Did not log feature importance chart. Error: {}'.format(e))
 
         # Log trees, end of training
-        if env.iteration + 1 == env.end_iteration and log_tree:
-            if env.cvfolds:
-                for j, cvpack in enumerate(env.cvfolds):
-                    _log_trees(cvpack.bst, log_tree, 'trees-cv-fold-{}'.format(j), _exp, **kwargs)
-            else:
-                _log_trees(env.model, log_tree, 'trees', _exp, **kwargs)
+        if log_tree:
+            try:
+                if env.cvfolds:
+                    for j, cvpack in enumerate(env.cvfolds):
+                        _log_trees(cvpack.bst, log_tree, 'trees-cv-fold-{}'.format(j), _exp, **kwargs)
+                else:
+                    _log_trees(env.model, log_tree, 'trees', _exp, **kwargs)
+            except Exception as e:
+                print('Did not log trees. Error: {}'.format(e))
     return callback
 
 
 def _log_model(booster, name, npt):
-    with tempfile.TemporaryDirectory(dir='.') as d:
-        path = os.path.join(d, name)
-        booster.save_model(path)
-        npt.log_artifact(path)
+    npt.log_artifact(BytesIO(booster.save_raw()), name)
 
 
-def _log_importance(booster, max_num_features, npt, **kwargs):
+def _log_importance(booster, max_num_features, npt, importance_type='weight', fmap='', ax=None,
+                    title='Feature importance', xlabel='F score', ylabel='Features', height=0.2, xlim=None, ylim=None,
+                    grid=True, show_values=True, **kwargs):
     try:
         import matplotlib.pyplot as plt
     except ImportError:
         raise ImportError('Please install matplotlib to log importance')
-    importance = xgb.plot_importance(booster, max_num_features=max_num_features, **kwargs) # pylint: disable=E1101
-    npt.log_image('feature_importance', importance.figure)
-    plt.close('all')
+    scores = booster.get_score(fmap=fmap, importance_type=importance_type)
+    if not scores:
+        raise ValueError('Booster.get_score() results in empty')
+    if max_num_features is None:
+        features = sorted(scores.items(), key=lambda item: item[1])
+    else:
+        features = heapq.nlargest(max_num_features, scores.items(), key=lambda item: item[1])[::-1]
+    labels = [name for name, _ in features]
+    values = [value for _, value in features]
+    ylocs = range(len(features))
+
+    if ax is None:
+        fig, ax = plt.subplots()
+    else:
+        fig = None
+    try:
+        ax.barh(ylocs, values, align='center', height=height, **kwargs)
+        if show_values:
+            for x, y in zip(values, ylocs):
+                ax.text(x + 1, y, x, va='center')
+        ax.set_yticks(ylocs)
+        ax.set_yticklabels(labels)
+        ax.set_xlim(xlim if xlim is not None else (0, max(values) * 1.1))
+        ax.set_ylim(ylim if ylim is not None else (-1, len(values)))
+        if title is not None:
+            ax.set_title(title)
+        if xlabel is not None:
+            ax.set_xlabel(xlabel)
+        if ylabel is not None:
+            ax.set_ylabel(ylabel)
+        ax.grid(grid)
+        npt.log_image('feature_importance', ax.figure)
+    finally:
+        if fig is not None:
+            plt.close(fig)
 
 
 def _log_trees(booster, tree_list, img_name, npt, **kwargs):
-    with tempfile.TemporaryDirectory(dir='.') as d:
-        for i in tree_list:
-            file_name = 'tree_{}'.format(i)
-            tree = xgb.to_graphviz(booster=booster, num_trees=i, **kwargs) # pylint: disable=E1101
-            tree.render(filename=file_name, directory=d, view=False, format='png')
-            npt.log_image(img_name,
-                          os.path.join(d, '{}.png'.format(file_name)),
-                          image_name=file_name)
+    cached_booster = _DumpCachingBooster(booster)
+    trees, invalid_trees = [], []
+    for i in tree_list:
+        try:
+            if i < 0:
+                raise IndexError
+            trees.append((i, xgb.to_graphviz(booster=cached_booster, num_trees=i, **kwargs))) # pylint: disable=E1101
+        except IndexError:
+            invalid_trees.append(i)
+    if invalid_trees:
+        print('Did not log trees {}, booster does not have trees with these indices.'.format(invalid_trees))
+    if not trees:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(8, len(trees))) as executor:
+        pngs = executor.map(lambda tree: tree[1].pipe(format='png'), trees)
+        for (i, _), png in zip(trees, pngs):
+            npt.log_image(img_name, Image.open(BytesIO(png)), image_name='tree_{}'.format(i))
+
+
+class _DumpCachingBooster:
+    """Booster wrapper for ``xgb.to_graphviz`` that dumps the model only once.
+
+    ``xgb.to_graphviz`` dumps the whole model and picks a single tree out of it,
+    so rendering several trees from the same booster repeats the full dump for each of them.
+    """
+
+    def __init__(self, booster):
+        self._booster = booster
+        self._dumps = {}
+
+    def get_dump(self, *args, **kwargs):
+        key = repr((args, sorted(kwargs.items())))
+        if key not in self._dumps:
+            self._dumps[key] = self._booster.get_dump(*args, **kwargs)
+        return self._dumps[key]
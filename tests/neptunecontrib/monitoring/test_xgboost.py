@@ -0,0 +1,151 @@
+#
+# Copyright (c) 2020, Neptune Labs Sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import unittest
+from io import BytesIO
+
+import numpy as np
+import xgboost as xgb
+from mock import MagicMock, call, patch
+from PIL import Image
+
+from neptunecontrib.monitoring.xgboost import neptune_callback
+
+
+def _env(iteration, end_iteration, evaluation_result_list, cvfolds=None):
+    return MagicMock(iteration=iteration,
+                     end_iteration=end_iteration,
+                     evaluation_result_list=evaluation_result_list,
+                     cvfolds=cvfolds)
+
+
+class TestNeptuneCallback(unittest.TestCase):
+    def setUp(self):
+        self.experiment = MagicMock()
+
+    def test_train_metrics_logged_every_iteration(self):
+        # given
+        callback = neptune_callback(log_model=False, log_importance=False, experiment=self.experiment)
+
+        # when
+        for i in range(3):
+            callback(_env(i, 10, [('train-rmse', 1.0 / (i + 1)), ('eval-rmse', 2.0 / (i + 1))]))
+
+        # then
+        self.assertEqual(self.experiment.log_metric.call_args_list,
+                         [call('train-rmse', 1.0), call('eval-rmse', 2.0),
+                          call('train-rmse', 0.5), call('eval-rmse', 1.0),
+                          call('train-rmse', 1.0 / 3), call('eval-rmse', 2.0 / 3)])
+        self.experiment.log_artifact.assert_not_called()
+        self.experiment.log_image.assert_not_called()
+
+    def test_cv_metrics_logged_as_mean_and_std(self):
+        # given
+        callback = neptune_callback(log_model=False, log_importance=False, experiment=self.experiment)
+
+        # when
+        for i in range(2):
+            callback(_env(i, 10, [('test-auc', 0.8 + i / 10, 0.01)], cvfolds=[MagicMock()]))
+
+        # then
+        self.assertEqual(self.experiment.log_metric.call_args_list,
+                         [call('test-auc-mean', 0.8), call('test-auc-std', 0.01),
+                          call('test-auc-mean', 0.9), call('test-auc-std', 0.01)])
+
+    def test_booster_logged_after_last_iteration(self):
+        # given
+        callback = neptune_callback(log_importance=False, experiment=self.experiment)
+        env = _env(2, 3, [('train-rmse', 0.1)])
+        env.model.save_raw.return_value = bytearray(b'booster')
+
+        # when
+        callback(_env(0, 3, [('train-rmse', 0.3)]))
+        callback(_env(1, 3, [('train-rmse', 0.2)]))
+        self.experiment.log_artifact.assert_not_called()
+        callback(env)
+
+        # then
+        self.assertEqual(self.experiment.log_metric.call_count, 3)
+        artifact, name = self.experiment.log_artifact.call_args[0]
+        self.assertEqual(artifact.getvalue(), b'booster')
+        self.assertEqual(name, 'bst.model')
+
+    def test_importance_chart_shows_top_features_and_forwards_barh_kwargs(self):
+        # given
+        callback = neptune_callback(log_model=False, max_num_features=2, experiment=self.experiment,
+                                    color='red', xlim=(0, 100))
+        env = _env(0, 1, [])
+        env.model.get_score.return_value = {'f0': 3.0, 'f1': 10.0, 'f2': 7.0}
+
+        # when
+        callback(env)
+
+        # then
+        name, fig = self.experiment.log_image.call_args[0]
+        ax = fig.axes[0]
+        self.assertEqual(name, 'feature_importance')
+        self.assertEqual([label.get_text() for label in ax.get_yticklabels()], ['f2', 'f1'])
+        self.assertEqual([rect.get_width() for rect in ax.patches], [7.0, 10.0])
+        self.assertEqual(ax.patches[0].get_facecolor(), (1.0, 0.0, 0.0, 1.0))
+        self.assertEqual(ax.get_xlim(), (0, 100))
+
+    def test_trees_rendered_from_single_dump_per_booster(self):
+        # given
+        png = BytesIO()
+        Image.new('RGB', (1, 1)).save(png, format='PNG')
+        rng = np.random.RandomState(0) # pylint: disable=E1101
+        dtrain = xgb.DMatrix(rng.rand(20, 3), label=rng.rand(20))
+        booster = xgb.train({'max_depth': 2}, dtrain, num_boost_round=3)
+
+        callback = neptune_callback(log_model=False, log_importance=False, log_tree=[0, 100, 200, -1, 2],
+                                    experiment=self.experiment)
+        env = _env(0, 1, [])
+        env.model = booster
+
+        # when
+        with patch.object(xgb.Booster, 'get_dump', autospec=True, side_effect=xgb.Booster.get_dump) as get_dump, \
+                patch('graphviz.Source.pipe', return_value=png.getvalue()):
+            callback(env)
+
+        # then
+        self.assertEqual(get_dump.call_count, 1)
+        self.assertEqual([c[1]['image_name'] for c in self.experiment.log_image.call_args_list],
+                         ['tree_0', 'tree_2'])
+
+
+    def test_cv_trees_dumped_once_per_fold(self):
+        # given
+        png = BytesIO()
+        Image.new('RGB', (1, 1)).save(png, format='PNG')
+        rng = np.random.RandomState(0) # pylint: disable=E1101
+        dtrain = xgb.DMatrix(rng.rand(20, 3), label=rng.rand(20))
+        cvfolds = [MagicMock(bst=xgb.train({'max_depth': 2}, dtrain, num_boost_round=3)) for _ in range(2)]
+
+        callback = neptune_callback(log_model=False, log_importance=False, log_tree=[0, 1, 2],
+                                    experiment=self.experiment)
+
+        # when
+        with patch.object(xgb.Booster, 'get_dump', autospec=True, side_effect=xgb.Booster.get_dump) as get_dump, \
+                patch('graphviz.Source.pipe', return_value=png.getvalue()):
+            callback(_env(0, 1, [], cvfolds=cvfolds))
+
+        # then
+        self.assertEqual(get_dump.call_count, 2)
+        self.assertEqual([c[0][0] for c in self.experiment.log_image.call_args_list],
+                         ['trees-cv-fold-0'] * 3 + ['trees-cv-fold-1'] * 3)
+
+if __name__ == '__main__':
+    unittest.main()